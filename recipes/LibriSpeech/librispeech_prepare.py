@@ -15,25 +15,25 @@ Author
 import os
 import csv
 import random
-from collections import Counter
 from dataclasses import dataclass
-import functools
 import logging
-from speechbrain.utils.data_utils import (
-    download_file,
-    get_all_files,
-)
+from concurrent.futures import ThreadPoolExecutor
+from speechbrain.utils.data_utils import download_file
 from speechbrain.dataio.dataio import (
     load_pkl,
     save_pkl,
     merge_csvs,
     read_audio_info,
 )
-from speechbrain.utils.parallel import parallel_map
+from speechbrain.utils.parallel import (
+    available_cpu_count,
+    get_process_count,
+    parallel_map,
+)
 
 logger = logging.getLogger(__name__)
 OPT_FILE = "opt_librispeech_prepare.pkl"
-SAMPLERATE = 16000
+SCAN_WORKERS = 4
 OPEN_SLR_11_LINK = "http://www.openslr.org/resources/11/"
 OPEN_SLR_11_NGRAM_MODELs = [
     "3-gram.arpa.gz",
@@ -112,8 +112,7 @@ def prepare_librispeech(
 
     # Other variables
     # Saving folder
-    if not os.path.exists(save_folder):
-        os.makedirs(save_folder)
+    os.makedirs(save_folder, exist_ok=True)
 
     save_opt = os.path.join(save_folder, OPT_FILE)
 
@@ -124,24 +123,16 @@ def prepare_librispeech(
     else:
         logger.info("Data_preparation...")
 
-    # Additional checks to make sure the data folder contains Librispeech
-    check_librispeech_folders(data_folder, splits)
+    # Listing the files of all the splits, which also makes sure that the
+    # data folder contains Librispeech
+    data_index = _index_data_folder(data_folder, splits)
 
     # create csv files for each split
-    all_texts = {}
     for split_index in range(len(splits)):
         split = splits[split_index]
-
-        wav_lst = get_all_files(
-            os.path.join(data_folder, split), match_and=[".flac"]
-        )
-
-        text_lst = get_all_files(
-            os.path.join(data_folder, split), match_and=["trans.txt"]
-        )
+        wav_lst, text_lst = data_index[split]
 
         text_dict = text_to_dict(text_lst)
-        all_texts.update(text_dict)
 
         if select_n_sentences is not None:
             n_sentences = select_n_sentences[split_index]
@@ -159,7 +150,7 @@ def prepare_librispeech(
 
     # Create lexicon.csv and oov.csv
     if create_lexicon:
-        create_lexicon_and_oov_csv(all_texts, save_folder)
+        create_lexicon_and_oov_csv(None, save_folder)
 
     # saving options
     save_pkl(conf, save_opt)
@@ -173,7 +164,8 @@ def create_lexicon_and_oov_csv(all_texts, save_folder):
     Arguments
     ---------
     all_texts : dict
-        Dictionary containing text from the librispeech transcriptions
+        Unused, the lexicon does not depend on the transcriptions. Kept for
+        backward compatibility; pass None.
     save_folder : str
         The directory where to store the csv files.
     """
@@ -187,19 +179,13 @@ def create_lexicon_and_oov_csv(all_texts, save_folder):
         )
         download_file(lexicon_url, lexicon_path)
 
-    # Get list of all words in the transcripts
-    transcript_words = Counter()
-    for key in all_texts:
-        transcript_words.update(all_texts[key].split("_"))
-
     # Get list of all words in the lexicon
     lexicon_words = []
     lexicon_pronunciations = []
     with open(lexicon_path, "r") as f:
         lines = f.readlines()
         for line in lines:
-            word = line.split()[0]
-            pronunciation = line.split()[1:]
+            word, *pronunciation = line.split()
             lexicon_words.append(word)
             lexicon_pronunciations.append(pronunciation)
 
@@ -209,17 +195,13 @@ def create_lexicon_and_oov_csv(all_texts, save_folder):
     with open(lexicon_csv_path, "w") as f:
         f.write(header)
         for idx in range(len(lexicon_words)):
-            separated_graphemes = [c for c in lexicon_words[idx]]
-            duration = len(separated_graphemes)
-            graphemes = " ".join(separated_graphemes)
+            word = lexicon_words[idx]
+            graphemes = " ".join(word)
             pronunciation_no_numbers = [
                 p.strip("0123456789") for p in lexicon_pronunciations[idx]
             ]
             phonemes = " ".join(pronunciation_no_numbers)
-            line = (
-                ",".join([str(idx), str(duration), graphemes, phonemes]) + "\n"
-            )
-            f.write(line)
+            f.write(f"{idx},{len(word)},{graphemes},{phonemes}\n")
     logger.info("Lexicon written to %s." % lexicon_csv_path)
 
     # Split lexicon.csv in train, validation, and test splits
@@ -276,10 +258,10 @@ class LSRow:
     words: str
 
 
-def process_line(wav_file, text_dict) -> LSRow:
-    snt_id = wav_file.split("/")[-1].replace(".flac", "")
-    spk_id = "-".join(snt_id.split("-")[0:2])
-    wrds = text_dict[snt_id]
+def process_line(utterance) -> LSRow:
+    snt_id, wav_file, wrds = utterance
+    # Ids are "spk-chapter-utt"
+    spk_id = snt_id.rsplit("-", 1)[0]
     wrds = " ".join(wrds.split("_"))
 
     info = read_audio_info(wav_file)
@@ -325,39 +307,53 @@ def create_csv(save_folder, wav_lst, text_dict, split, select_n_sentences):
     msg = "Creating csv lists in  %s..." % (csv_file)
     logger.info(msg)
 
-    csv_lines = [["ID", "duration", "wav", "spk_id", "wrd"]]
+    # Only the selected sentences are sent to the workers
+    wav_lst = wav_lst[:select_n_sentences]
+
+    # Each file is sent to the workers along with its id and its own text
+    # only, rather than pickling the whole text_dict along with every chunk.
+    # The tuples are built as the workers consume them.
+    def utterances():
+        for wav_file in wav_lst:
+            # wav_file always ends with ".flac"
+            snt_id = os.path.basename(wav_file)[:-5]
+            yield snt_id, wav_file, text_dict[snt_id]
 
-    snt_cnt = 0
-    line_processor = functools.partial(process_line, text_dict=text_dict)
-    # Processing all the wav files in wav_lst
     # FLAC metadata reading is already fast, so we set a high chunk size
-    # to limit main thread CPU bottlenecks
-    for row in parallel_map(line_processor, wav_lst, chunk_size=8192):
-        csv_line = [
-            row.snt_id,
-            str(row.duration),
-            row.file_path,
-            row.spk_id,
-            row.words,
-        ]
-
-        # Appending current file to the csv_lines list
-        csv_lines.append(csv_line)
-
-        snt_cnt = snt_cnt + 1
-
-        # parallel_map guarantees element ordering so we're OK
-        if snt_cnt == select_n_sentences:
-            break
-
-    # Writing the csv_lines
-    with open(csv_file, mode="w") as csv_f:
+    # to limit main thread CPU bottlenecks, while still giving each worker a
+    # few chunks (a fixed size of 8192 ran the dev and test splits serially).
+    # Reading the headers is I/O bound, hence twice as many workers as cores.
+    chunk_size = min(8192, max(8, len(wav_lst) // (4 * available_cpu_count())))
+
+    # Rows are written as soon as the workers return them. They go to a
+    # temporary file first, so that an interrupted run does not leave a
+    # partial csv behind that later runs would consider complete. A large
+    # buffer turns the many small row writes into a few write syscalls.
+    tmp_csv_file = csv_file + ".tmp"
+    with open(tmp_csv_file, mode="w", buffering=1 << 20) as csv_f:
         csv_writer = csv.writer(
             csv_f, delimiter=",", quotechar='"', quoting=csv.QUOTE_MINIMAL
         )
-
-        for line in csv_lines:
-            csv_writer.writerow(line)
+        csv_writer.writerow(["ID", "duration", "wav", "spk_id", "wrd"])
+
+        # Processing all the wav files in wav_lst
+        for row in parallel_map(
+            process_line,
+            utterances(),
+            process_count=get_process_count(2),
+            chunk_size=chunk_size,
+            progress_bar_kwargs={"total": len(wav_lst), "smoothing": 0.02},
+        ):
+            csv_writer.writerow(
+                [
+                    row.snt_id,
+                    str(row.duration),
+                    row.file_path,
+                    row.spk_id,
+                    row.words,
+                ]
+            )
+    os.replace(tmp_csv_file, csv_file)
 
     # Final print
     msg = "%s successfully created!" % (csv_file)
@@ -384,26 +380,116 @@ def skip(splits, save_folder, conf):
         if False, it must be done.
     """
 
-    # Checking csv files
-    skip = True
-
+    # Checking csv files, listing the save folder once instead of
+    # issuing a stat call per split
+    try:
+        with os.scandir(save_folder) as entries:
+            existing = {entry.name for entry in entries if entry.is_file()}
+    except FileNotFoundError:
+        existing = set()
     for split in splits:
-        if not os.path.isfile(os.path.join(save_folder, split + ".csv")):
-            skip = False
+        if split + ".csv" not in existing:
+            return False
 
     #  Checking saved options
-    save_opt = os.path.join(save_folder, OPT_FILE)
-    if skip is True:
-        if os.path.isfile(save_opt):
-            opts_old = load_pkl(save_opt)
-            if opts_old == conf:
-                skip = True
-            else:
-                skip = False
-        else:
-            skip = False
+    if OPT_FILE in existing:
+        return load_pkl(os.path.join(save_folder, OPT_FILE)) == conf
+    return False
+
+
+def _index_data_folder(data_folder, splits):
+    """
+    Gathers the audio and the transcription files of every split, in a
+    single pass over the data folder.
+
+    Arguments
+    ---------
+    data_folder : str
+        The path to the directory with the data.
+    splits : list
+        The portions of the data to index.
 
-    return skip
+    Returns
+    -------
+    dict
+        The (wav_lst, text_lst) pair of each split.
+
+    Raises
+    ------
+    OSError
+        If LibriSpeech is not found at the specified path.
+    """
+    data_index = {}
+    missing_folders = []
+    # Reading directories is latency bound: a few threads walking the
+    # speakers concurrently keep several requests in flight
+    with ThreadPoolExecutor(max_workers=SCAN_WORKERS) as executor:
+        for split in splits:
+            split_folder = os.path.join(data_folder, split)
+            try:
+                data_index[split] = _scan_flac_and_trans(split_folder, executor)
+            except (FileNotFoundError, NotADirectoryError) as e:
+                if e.filename != split_folder:
+                    raise
+                missing_folders.append(split_folder)
+
+    # Checking if all the splits exist
+    if missing_folders:
+        err_msg = (
+            "the folder(s) %s do not exist (they are expected in the "
+            "Librispeech dataset)" % ", ".join(missing_folders)
+        )
+        raise OSError(err_msg)
+    return data_index
+
+
+def _scan_flac_and_trans(folder, executor=None):
+    """
+    Gathers the audio and the transcription files found within a folder, in
+    a single walk of the directory tree.
+
+    Arguments
+    ---------
+    folder : str
+        The directory to search.
+    executor : concurrent.futures.Executor, optional
+        If provided, the sub-directories of the folder (e.g. the speakers of
+        a split) are walked concurrently with it.
+
+    Returns
+    -------
+    wav_lst : list
+        The flac files found within the folder, grouped by directory and
+        sorted by name within each directory.
+    text_lst : list
+        The transcription files found within the folder.
+    """
+    # scandir entries know their type, which avoids a stat per entry.
+    # Sorting them makes the order independent of the file system, while
+    # the files of a directory stay contiguous, so that the chunks sent to
+    # each worker only touch the few directories they belong to.
+    with os.scandir(folder) as entries:
+        entries = sorted(entries, key=lambda entry: entry.name)
+
+    subdirs = [entry.path for entry in entries if entry.is_dir()]
+    if executor is not None:
+        sub_results = executor.map(_scan_flac_and_trans, subdirs)
+    else:
+        sub_results = map(_scan_flac_and_trans, subdirs)
+    sub_results = iter(sub_results)
+
+    # Keeping the files in the order of the sorted directory entries
+    wav_lst, text_lst = [], []
+    for entry in entries:
+        if entry.is_dir():
+            sub_wav_lst, sub_text_lst = next(sub_results)
+            wav_lst.extend(sub_wav_lst)
+            text_lst.extend(sub_text_lst)
+        elif entry.name.endswith(".flac"):
+            wav_lst.append(entry.path)
+        elif entry.name.endswith("trans.txt"):
+            text_lst.append(entry.path)
+    return wav_lst, text_lst
 
 
 def text_to_dict(text_lst):
@@ -423,43 +509,36 @@ def text_to_dict(text_lst):
     """
     # Initialization of the text dictionary
     text_dict = {}
-    # Reading all the transcription files is text_lst
+    # Reading all the transcription files is text_lst. Each one only holds a
+    # few dozen lines, so a process pool would cost more than it saves.
     for file in text_lst:
-        with open(file, "r") as f:
-            # Reading all line of the transcription file
-            for line in f:
-                line_lst = line.strip().split(" ")
-                text_dict[line_lst[0]] = "_".join(line_lst[1:])
+        text_dict.update(parse_trans_file(file))
     return text_dict
 
 
-def check_librispeech_folders(data_folder, splits):
+def parse_trans_file(file):
     """
-    Check if the data folder actually contains the LibriSpeech dataset.
-
-    If it does not, an error is raised.
+    Reads the transcriptions of a single librispeech transcription file.
 
     Arguments
     ---------
-    data_folder : str
-        The path to the directory with the data.
-    splits : list
-        The portions of the data to check.
+    file : str
+        Path to the transcription file.
 
-    Raises
-    ------
-    OSError
-        If LibriSpeech is not found at the specified path.
+    Returns
+    -------
+    dict
+        The dictionary containing the text transcriptions for each sentence
+        of the file.
     """
-    # Checking if all the splits exist
-    for split in splits:
-        split_folder = os.path.join(data_folder, split)
-        if not os.path.exists(split_folder):
-            err_msg = (
-                "the folder %s does not exist (it is expected in the "
-                "Librispeech dataset)" % split_folder
-            )
-            raise OSError(err_msg)
+    text_dict = {}
+    with open(file, "r") as f:
+        # Reading all line of the transcription file
+        for line in f:
+            # Only the id is split off, the words are joined in a single call
+            snt_id, _, words = line.strip().partition(" ")
+            text_dict[snt_id] = words.replace(" ", "_")
+    return text_dict
 
 
 def download_librispeech_vocab_text(destination):
@@ -11,11 +11,16 @@ Authors
 import os
 import json
 import logging
-from speechbrain.utils.data_utils import get_all_files
-from speechbrain.dataio.dataio import read_audio
+import functools
+from concurrent.futures import ProcessPoolExecutor
+from speechbrain.dataio.dataio import read_audio_info
+from speechbrain.utils.parallel import (
+    available_cpu_count,
+    get_process_count,
+    parallel_map,
+)
 
 logger = logging.getLogger(__name__)
-SAMPLERATE = 16000
 
 
 def prepare_timit(
@@ -70,15 +75,18 @@ def prepare_timit(
     # Getting speaker dictionary
     dev_spk, test_spk = _get_speaker()
     avoid_sentences = ["sa1", "sa2"]
-    extension = [".wav"]
 
     # Checking TIMIT_uppercase
     if uppercase:
         avoid_sentences = [item.upper() for item in avoid_sentences]
-        extension = [item.upper() for item in extension]
         dev_spk = [item.upper() for item in dev_spk]
         test_spk = [item.upper() for item in test_spk]
 
+    # Sets are used for constant-time lookups while walking the dataset
+    dev_spk = frozenset(dev_spk)
+    test_spk = frozenset(test_spk)
+    avoid_sentences = frozenset(avoid_sentences)
+
     # Check if this phase is already done (if so, skip it)
     if skip([save_json_train, save_json_valid, save_json_test]):
         logger.info("Skipping preparation, completed in previous run.")
@@ -90,30 +98,77 @@ def prepare_timit(
     msg = "Creating json files for the TIMIT Dataset.."
     logger.info(msg)
 
+    # Lists of the wav files, gathered in a single walk of the dataset
+    wav_lsts = _get_wav_lists(
+        data_folder, uppercase, dev_spk, test_spk, avoid_sentences
+    )
+
     # Creating json files
-    # NOTE: TIMIT has the DEV files in the test directory.
-    splits = ["train", "test", "test"]
+    # NOTE: every split already keeps all the cores busy, so the splits are
+    # processed one after the other, sharing the same pool of workers.
+    # The work is dominated by small file reads, so there are twice as many
+    # workers as cores to keep more reads in flight.
     annotations = [save_json_train, save_json_valid, save_json_test]
-    match_or = [None, dev_spk, test_spk]
-
-    for split, save_file, match in zip(splits, annotations, match_or):
-        if uppercase:
-            match_lst = extension + [split.upper()]
-        else:
-            match_lst = extension + [split]
-
-        # List of the wav files
-        wav_lst = get_all_files(
-            data_folder,
-            match_and=match_lst,
-            match_or=match,
-            exclude_or=avoid_sentences,
-        )
-        if split == "dev":
-            print(wav_lst)
+    with ProcessPoolExecutor(max_workers=get_process_count(2)) as executor:
+        for wav_lst, save_file in zip(wav_lsts, annotations):
+            create_json(wav_lst, save_file, uppercase, phn_set, executor)
 
-        # Json creation
-        create_json(wav_lst, save_file, uppercase, phn_set)
+
+def _get_wav_lists(data_folder, uppercase, dev_spk, test_spk, avoid_sentences):
+    """
+    Gathers the wav files of the train, dev and test sets with a single walk
+    of the train and test directories.
+
+    NOTE: TIMIT has the DEV files in the test directory.
+
+    Arguments
+    ---------
+    data_folder : str
+        Path to the folder where the original TIMIT dataset is stored.
+    uppercase : bool
+        Whether the files and folders are uppercase.
+    dev_spk : frozenset
+        The speakers of the dev set.
+    test_spk : frozenset
+        The speakers of the test set.
+    avoid_sentences : frozenset
+        The sentences (e.g. sa1) to leave out.
+
+    Returns
+    -------
+    train_lst : list
+        The wav files of the train set.
+    dev_lst : list
+        The wav files of the dev set.
+    test_lst : list
+        The wav files of the test set.
+    """
+    extension = ".wav"
+    train_dir, test_dir = "train", "test"
+    if uppercase:
+        extension = extension.upper()
+        train_dir, test_dir = train_dir.upper(), test_dir.upper()
+
+    train_lst, dev_lst, test_lst = [], [], []
+    for split_dir in [train_dir, test_dir]:
+        for root, _, files in os.walk(os.path.join(data_folder, split_dir)):
+            # The wav files are stored in the speaker directories
+            spk_id = os.path.basename(root)
+            if split_dir == train_dir:
+                wav_lst = train_lst
+            elif spk_id in dev_spk:
+                wav_lst = dev_lst
+            elif spk_id in test_spk:
+                wav_lst = test_lst
+            else:
+                continue
+
+            for name in files:
+                snt_id, ext = os.path.splitext(name)
+                if ext == extension and snt_id not in avoid_sentences:
+                    wav_lst.append(os.path.join(root, name))
+
+    return train_lst, dev_lst, test_lst
 
 
 def _get_phonemes():
@@ -366,7 +421,64 @@ def skip(annotations):
     return skip
 
 
-def create_json(wav_lst, json_file, uppercase, phn_set):
+def process_line(wav_file, uppercase, phn_set):
+    """
+    Gathers the json entry of a single wav file.
+
+    Arguments
+    ---------
+    wav_file : str
+        The path of the wav file.
+    uppercase : bool
+        Whether this is the uppercase version of timit.
+    phn_set : {60, 48, 39}
+        The phoneme set to use in the phn label.
+
+    Returns
+    -------
+    snt_id : str
+        The sentence id.
+    entry : dict
+        The json entry of the sentence.
+    """
+    # Getting sentence and speaker ids
+    spk_dir, _, snt_id = wav_file.rpartition("/")
+    spk_id = spk_dir.rpartition("/")[2]
+    snt_id = f"{spk_id}_{snt_id.replace('.wav', '')}"
+
+    # Reading the header only (to retrieve duration in seconds)
+    info = read_audio_info(wav_file)
+    duration = info.num_frames / info.sample_rate
+
+    # Retrieving words and check for uppercase
+    if uppercase:
+        wrd_file = f"{wav_file[:-4]}.WRD"
+    else:
+        wrd_file = f"{wav_file[:-4]}.wrd"
+
+    # Each line is "start end word": keeping every third token
+    words = " ".join(_read_transcript(wrd_file).split()[2::3])
+
+    # Retrieving phonemes
+    if uppercase:
+        phn_file = f"{wav_file[:-4]}.PHN"
+    else:
+        phn_file = f"{wav_file[:-4]}.phn"
+
+    # Getting the phoneme and ground truth ends lists from the phn files
+    phonemes, ends = get_phoneme_lists(phn_file, phn_set)
+
+    return snt_id, {
+        "wav": wav_file,
+        "duration": duration,
+        "spk_id": spk_id,
+        "phn": phonemes,
+        "wrd": words,
+        "ground_truth_phn_ends": ends,
+    }
+
+
+def create_json(wav_lst, json_file, uppercase, phn_set, executor=None):
     """
     Creates the json file given a list of wav files.
 
@@ -381,65 +493,61 @@ def create_json(wav_lst, json_file, uppercase, phn_set):
     phn_set : {60, 48, 39}, optional,
         Default: 39
         The phoneme set to use in the phn label.
+    executor : concurrent.futures.Executor, optional
+        Default: None
+        The pool of workers processing the wav files. If None, a process
+        pool is spawned for this split only.
     """
 
     # Adding some Prints
     msg = "Creating %s..." % (json_file)
     logger.info(msg)
-    json_dict = {}
-
-    for wav_file in wav_lst:
-        # Getting sentence and speaker ids
-        spk_id = wav_file.split("/")[-2]
-        snt_id = wav_file.split("/")[-1].replace(".wav", "")
-        snt_id = spk_id + "_" + snt_id
-
-        # Reading the signal (to retrieve duration in seconds)
-        signal = read_audio(wav_file)
-        duration = len(signal) / SAMPLERATE
-
-        # Retrieving words and check for uppercase
-        if uppercase:
-            wrd_file = wav_file.replace(".WAV", ".WRD")
-        else:
-            wrd_file = wav_file.replace(".wav", ".wrd")
-
-        if not os.path.exists(os.path.dirname(wrd_file)):
-            err_msg = "the wrd file %s does not exists!" % (wrd_file)
-            raise FileNotFoundError(err_msg)
-
-        words = [line.rstrip("\n").split(" ")[2] for line in open(wrd_file)]
-        words = " ".join(words)
-
-        # Retrieving phonemes
-        if uppercase:
-            phn_file = wav_file.replace(".WAV", ".PHN")
-        else:
-            phn_file = wav_file.replace(".wav", ".phn")
-
-        if not os.path.exists(os.path.dirname(phn_file)):
-            err_msg = "the wrd file %s does not exists!" % (phn_file)
-            raise FileNotFoundError(err_msg)
-
-        # Getting the phoneme and ground truth ends lists from the phn files
-        phonemes, ends = get_phoneme_lists(phn_file, phn_set)
-
-        json_dict[snt_id] = {
-            "wav": wav_file,
-            "duration": duration,
-            "spk_id": spk_id,
-            "phn": phonemes,
-            "wrd": words,
-            "ground_truth_phn_ends": ends,
-        }
-
-    # Writing the dictionary to the json file
-    with open(json_file, mode="w") as json_f:
-        json.dump(json_dict, json_f, indent=2)
+
+    line_processor = functools.partial(
+        process_line, uppercase=uppercase, phn_set=phn_set
+    )
+    # Each file is handled independently, so the work is spread over all
+    # the cores with enough chunks per worker to keep them busy
+    chunk_size = max(1, len(wav_lst) // (4 * available_cpu_count()))
+
+    # Writing the entries to the json file as soon as they are ready, so that
+    # the split is never held in memory. The output is the same as
+    # json.dump(json_dict, json_f, indent=2). The entries go to a temporary
+    # file first, so that an interrupted run does not leave a truncated json
+    # behind that later runs would consider complete.
+    tmp_json_file = json_file + ".tmp"
+    with open(tmp_json_file, mode="w", buffering=1 << 20) as json_f:
+        separator = "{\n"
+        for snt_id, entry in parallel_map(
+            line_processor, wav_lst, chunk_size=chunk_size, executor=executor
+        ):
+            entry = json.dumps(entry, indent=2).replace("\n", "\n  ")
+            json_f.write(f"{separator}  {json.dumps(snt_id)}: {entry}")
+            separator = ",\n"
+        json_f.write("{}" if separator == "{\n" else "\n}")
+    os.replace(tmp_json_file, json_file)
 
     logger.info(f"{json_file} successfully created!")
 
 
+def _read_transcript(path):
+    """
+    Reads a whole (small) transcription file.
+
+    Arguments
+    ---------
+    path : str
+        Path to the file.
+
+    Returns
+    -------
+    str
+        The content of the file.
+    """
+    with open(path) as f:
+        return f.read()
+
+
 def get_phoneme_lists(phn_file, phn_set):
     """
     Reads the phn file and gets the phoneme list & ground truth ends list.
@@ -448,22 +556,24 @@ def get_phoneme_lists(phn_file, phn_set):
     phonemes = []
     ends = []
 
-    for line in open(phn_file):
-        end, phoneme = line.rstrip("\n").replace("h#", "sil").split(" ")[1:]
+    # Each line is "start end phoneme"
+    tokens = _read_transcript(phn_file).replace("h#", "sil").split()
+
+    # Getting dictionaries for phoneme conversion
+    from_60_to_48_phn, from_60_to_39_phn = _get_phonemes()
 
-        # Getting dictionaries for phoneme conversion
-        from_60_to_48_phn, from_60_to_39_phn = _get_phonemes()
+    # Selecting the conversion once for the whole file
+    phn_map = {48: from_60_to_48_phn, 39: from_60_to_39_phn}.get(phn_set)
+    remove_q_end = phn_set != 60
 
+    for end, phoneme in zip(tokens[1::3], tokens[2::3]):
         # Removing end corresponding to q if phn set is not 61
-        if phn_set != 60:
-            if phoneme == "q":
-                end = ""
+        if remove_q_end and phoneme == "q":
+            end = ""
 
         # Converting phns if necessary
-        if phn_set == 48:
-            phoneme = from_60_to_48_phn[phoneme]
-        if phn_set == 39:
-            phoneme = from_60_to_39_phn[phoneme]
+        if phn_map is not None:
+            phoneme = phn_map[phoneme]
 
         # Appending arrays
         if len(phoneme) > 0:
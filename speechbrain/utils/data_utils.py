@@ -13,6 +13,8 @@ import os
 import re
 import csv
 import shutil
+import subprocess
+import tarfile
 import urllib.request
 import collections.abc
 import torch
@@ -91,78 +93,46 @@ def get_all_files(
     >>> get_all_files('tests/samples/RIRs', match_and=['3.wav'])
     ['tests/samples/RIRs/rir3.wav']
     """
-    # Match/exclude variable initialization
-    match_and_entry = True
-    match_or_entry = True
-    exclude_or_entry = False
-    exclude_and_entry = False
-
-    # Create a list of file and sub directories
-    listOfFile = os.listdir(dirName)
+    # Create a list of file and sub directories. The scandir entries know
+    # their type, so only symbolic links need an extra stat call.
+    with os.scandir(dirName) as entries:
+        listOfFile = list(entries)
     allFiles = list()
 
     # Iterate over all the entries
     for entry in listOfFile:
 
         # Create full path
-        fullPath = os.path.join(dirName, entry)
+        fullPath = entry.path
 
         # If entry is a directory then get the list of files in this directory
-        if os.path.isdir(fullPath):
-            allFiles = allFiles + get_all_files(
-                fullPath,
-                match_and=match_and,
-                match_or=match_or,
-                exclude_and=exclude_and,
-                exclude_or=exclude_or,
+        if entry.is_dir():
+            allFiles.extend(
+                get_all_files(
+                    fullPath,
+                    match_and=match_and,
+                    match_or=match_or,
+                    exclude_and=exclude_and,
+                    exclude_or=exclude_or,
+                )
             )
-        else:
 
-            # Check match_and case
-            if match_and is not None:
-                match_and_entry = False
-                match_found = 0
-
-                for ele in match_and:
-                    if ele in fullPath:
-                        match_found = match_found + 1
-                if match_found == len(match_and):
-                    match_and_entry = True
-
-            # Check match_or case
-            if match_or is not None:
-                match_or_entry = False
-                for ele in match_or:
-                    if ele in fullPath:
-                        match_or_entry = True
-                        break
-
-            # Check exclude_and case
-            if exclude_and is not None:
-                match_found = 0
-
-                for ele in exclude_and:
-                    if ele in fullPath:
-                        match_found = match_found + 1
-                if match_found == len(exclude_and):
-                    exclude_and_entry = True
-
-            # Check exclude_or case
-            if exclude_or is not None:
-                exclude_or_entry = False
-                for ele in exclude_or:
-                    if ele in fullPath:
-                        exclude_or_entry = True
-                        break
-
-            # If needed, append the current file to the output list
-            if (
-                match_and_entry
-                and match_or_entry
-                and not (exclude_and_entry)
-                and not (exclude_or_entry)
-            ):
-                allFiles.append(fullPath)
+        # Append the current file to the output list if it passes all the
+        # checks. Each check stops at the first pattern deciding its outcome,
+        # and the following checks are skipped as soon as one fails.
+        elif (
+            (match_and is None or all(ele in fullPath for ele in match_and))
+            and (match_or is None or any(ele in fullPath for ele in match_or))
+            and (
+                exclude_and is None
+                or not all(ele in fullPath for ele in exclude_and)
+            )
+            and (
+                exclude_or is None
+                or not any(ele in fullPath for ele in exclude_or)
+            )
+        ):
+            allFiles.append(fullPath)
 
     return allFiles
 
@@ -321,7 +291,9 @@ def download_file(
     dest : path
         Destination path.
     unpack : bool
-        If True, it unpacks the data in the dest folder.
+        If True, it unpacks the data in the dest folder. Tar archives
+        (including .tar.gz and .tgz) are extracted, while other .gz files are
+        decompressed.
     dest_unpack: path
         Path where to store the unpacked dataset
     replace_existing : bool
@@ -348,7 +320,15 @@ def download_file(
             dest_dir = pathlib.Path(dest).resolve().parent
             dest_dir.mkdir(parents=True, exist_ok=True)
             if "http" not in source:
-                shutil.copyfile(source, dest)
+                if replace_existing or not _is_synced_copy(source, dest):
+                    # copyfile relies on zero-copy syscalls (e.g. sendfile)
+                    shutil.copyfile(source, dest)
+                    src_stat = os.stat(source)
+                    os.utime(
+                        dest, ns=(src_stat.st_atime_ns, src_stat.st_mtime_ns)
+                    )
+                else:
+                    print(f"{dest} is up to date. Skipping copy")
 
             elif not os.path.isfile(dest) or (
                 os.path.isfile(dest) and replace_existing
@@ -372,15 +352,11 @@ def download_file(
                     dest_unpack = os.path.dirname(dest)
                 print(f"Extracting {dest} to {dest_unpack}")
                 # shutil unpack_archive does not work with tar.gz files
-                if (
-                    source.endswith(".tar.gz")
-                    or source.endswith(".tgz")
-                    or source.endswith(".gz")
-                ):
+                if source.endswith(".tar.gz") or source.endswith(".tgz"):
+                    extract_tar_gz(dest, dest_unpack)
+                elif source.endswith(".gz"):
                     out = dest.replace(".gz", "")
-                    with gzip.open(dest, "rb") as f_in:
-                        with open(out, "wb") as f_out:
-                            shutil.copyfileobj(f_in, f_out)
+                    gunzip(dest, out)
                 else:
                     shutil.unpack_archive(dest, dest_unpack)
                 if write_permissions:
@@ -390,6 +366,107 @@ def download_file(
         sb.utils.distributed.ddp_barrier()
 
 
+def _is_synced_copy(source, dest):
+    """Checks whether dest is an up-to-date copy of source, using the same
+    quick check as rsync (same size and modification time).
+
+    Arguments
+    ---------
+    source : path
+        Path of the source file.
+    dest : path
+        Path of the copy.
+
+    Returns
+    -------
+    bool
+        True if dest exists and matches the size and mtime of source.
+    """
+    if not os.path.isfile(dest):
+        return False
+    src_stat, dest_stat = os.stat(source), os.stat(dest)
+    return (
+        src_stat.st_size == dest_stat.st_size
+        and src_stat.st_mtime_ns == dest_stat.st_mtime_ns
+    )
+
+
+def _parallel_gunzip_cmd():
+    """Returns the command line of the fastest gzip decompressor available
+    on the system, or None if none was found.
+
+    rapidgzip decompresses a single gzip stream on all the cores, while pigz
+    offloads reading, writing and checksumming to separate threads.
+    """
+    if shutil.which("rapidgzip") is not None:
+        return ["rapidgzip", "-d", "-c", "-P", "0"]
+    if shutil.which("pigz") is not None:
+        return ["pigz", "-d", "-c"]
+    return None
+
+
+def gunzip(source, dest):
+    """Decompresses a gzip file.
+
+    An external parallel decompressor (rapidgzip or pigz) is used when it is
+    installed, as the gzip module inflates on a single core. Otherwise, it
+    falls back to the gzip module.
+
+    Arguments
+    ---------
+    source : path
+        Path of the gzip file.
+    dest : path
+        Path of the decompressed file.
+    """
+    cmd = _parallel_gunzip_cmd()
+    if cmd is not None:
+        with open(dest, "wb") as f_out:
+            subprocess.run(cmd + [source], stdout=f_out, check=True)
+    else:
+        with gzip.open(source, "rb") as f_in:
+            with open(dest, "wb") as f_out:
+                shutil.copyfileobj(f_in, f_out)
+
+
+def extract_tar_gz(source, dest):
+    """Extracts a gzip-compressed tar archive in a single streaming pass,
+    without writing the intermediate tar file to disk.
+
+    As in `gunzip`, the archive is inflated by rapidgzip or pigz when one of
+    them is installed, and by the gzip module otherwise.
+
+    Arguments
+    ---------
+    source : path
+        Path of the tar.gz archive.
+    dest : path
+        Directory where to extract the archive.
+    """
+    # Refuse members escaping dest (absolute paths, "..", special files)
+    # whenever the running python supports extraction filters
+    extract_kwargs = {}
+    if hasattr(tarfile, "data_filter"):
+        extract_kwargs["filter"] = "data"
+
+    cmd = _parallel_gunzip_cmd()
+    if cmd is not None:
+        cmd = cmd + [source]
+        with subprocess.Popen(cmd, stdout=subprocess.PIPE) as proc:
+            with tarfile.open(fileobj=proc.stdout, mode="r|") as tar:
+                tar.extractall(dest, **extract_kwargs)
+            # tarfile stops at the end-of-archive marker: the trailing
+            # padding must still be consumed, or closing the pipe would kill
+            # the decompressor with SIGPIPE
+            while proc.stdout.read(1 << 20):
+                pass
+        if proc.returncode != 0:
+            raise subprocess.CalledProcessError(proc.returncode, cmd)
+    else:
+        with tarfile.open(source, mode="r|gz") as tar:
+            tar.extractall(dest, **extract_kwargs)
+
+
 def set_writing_permissions(folder_path):
     """
     This function sets user writing permissions to all the files in the given folder.
@@ -7,6 +7,8 @@ Authors
 
 import itertools
 import multiprocessing
+import os
+import sys
 from collections import deque
 from concurrent.futures import Executor, ProcessPoolExecutor
 from threading import Condition
@@ -15,6 +17,57 @@ from typing import Any, Callable, Iterable, Optional
 from tqdm.auto import tqdm
 
 
+# ProcessPoolExecutor refuses more workers than this on Windows
+_MAX_WINDOWS_WORKERS = 61
+
+
+def available_cpu_count() -> int:
+    """Returns the number of CPUs the current process is allowed to run on.
+
+    Unlike `os.cpu_count()`, this honors the CPU affinity of the process
+    (e.g. as set by SLURM or `taskset`) where the platform exposes it.
+
+    Returns
+    -------
+    int
+        The number of usable CPUs, or 1 if it cannot be determined.
+
+    Example
+    -------
+    >>> available_cpu_count() >= 1
+    True
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return max(1, len(os.sched_getaffinity(0)))
+    return os.cpu_count() or 1
+
+
+def get_process_count(processes_per_cpu: int = 1) -> int:
+    """Returns a number of worker processes proportional to the usable CPUs,
+    within the limit `ProcessPoolExecutor` has on the current platform.
+
+    Arguments
+    ---------
+    processes_per_cpu: int
+        How many processes to start per usable CPU. Values above 1 may help
+        I/O-bound tasks keep more requests in flight.
+
+    Returns
+    -------
+    int
+        The number of worker processes, at least 1.
+
+    Example
+    -------
+    >>> get_process_count(2) >= 2
+    True
+    """
+    process_count = processes_per_cpu * available_cpu_count()
+    if sys.platform == "win32":
+        process_count = min(process_count, _MAX_WINDOWS_WORKERS)
+    return max(1, process_count)
+
+
 def _chunk_process_wrapper(fn, chunk):
     return list(map(fn, chunk))
 
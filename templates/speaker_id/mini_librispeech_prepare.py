@@ -14,11 +14,10 @@ import shutil
 import random
 import logging
 from speechbrain.utils.data_utils import get_all_files, download_file
-from speechbrain.dataio.dataio import read_audio
+from speechbrain.dataio.dataio import read_audio_info
 
 logger = logging.getLogger(__name__)
 MINILIBRI_TRAIN_URL = "http://www.openslr.org/resources/31/train-clean-5.tar.gz"
-SAMPLERATE = 16000
 
 
 def prepare_mini_librispeech(
@@ -99,9 +98,9 @@ def create_json(wav_list, json_file):
     json_dict = {}
     for wav_file in wav_list:
 
-        # Reading the signal (to retrieve duration in seconds)
-        signal = read_audio(wav_file)
-        duration = signal.shape[0] / SAMPLERATE
+        # Reading the header only (to retrieve duration in seconds)
+        info = read_audio_info(wav_file)
+        duration = info.num_frames / info.sample_rate
 
         # Manipulate path to get relative path and uttid
         path_parts = wav_file.split(os.path.sep)
@@ -0,0 +1,98 @@
+import gzip
+import io
+import os
+import pathlib
+import shutil
+import tarfile
+
+import pytest
+
+
+def _make_tar_gz(archive_path, files, padding=0):
+    """Writes a tar.gz archive holding `files`, a dict mapping member names
+    to their content, with `padding` zero bytes after the end of the tar."""
+    tar_buffer = io.BytesIO()
+    with tarfile.open(fileobj=tar_buffer, mode="w") as tar:
+        for name, content in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            tar.addfile(info, io.BytesIO(content))
+    with gzip.open(archive_path, "wb") as f:
+        f.write(tar_buffer.getvalue() + bytes(padding))
+
+
+def _check_extracted(dest, files):
+    for name, content in files.items():
+        with open(os.path.join(dest, name), "rb") as f:
+            assert f.read() == content
+
+
+@pytest.mark.parametrize("decompressor", ["gzip_module", "external"])
+@pytest.mark.parametrize("padding", [0, 1 << 20])
+def test_extract_tar_gz(tmp_path, monkeypatch, decompressor, padding):
+    from speechbrain.utils import data_utils
+
+    if decompressor == "external":
+        if shutil.which("gzip") is None:
+            pytest.skip("gzip is not installed")
+        # Stands in for rapidgzip/pigz, which take the same options
+        monkeypatch.setattr(
+            data_utils, "_parallel_gunzip_cmd", lambda: ["gzip", "-d", "-c"]
+        )
+    else:
+        monkeypatch.setattr(data_utils, "_parallel_gunzip_cmd", lambda: None)
+
+    files = {
+        "data/a.txt": b"hello",
+        "data/sub/b.txt": b"world" * 1000,
+    }
+    archive = tmp_path / "data.tar.gz"
+    # The padding exceeds the pipe buffer, so the decompressor is still
+    # writing once tarfile reached the end of the archive
+    _make_tar_gz(archive, files, padding=padding)
+
+    dest = tmp_path / "out"
+    data_utils.extract_tar_gz(str(archive), str(dest))
+    _check_extracted(dest, files)
+
+
+def test_download_file_unpacks_tar_gz(tmp_path, monkeypatch):
+    from speechbrain.utils import data_utils
+
+    monkeypatch.setattr(data_utils, "_parallel_gunzip_cmd", lambda: None)
+
+    files = {"LibriSpeech/dev-clean/1-1-0000.txt": b"a transcript"}
+    source = tmp_path / "source.tar.gz"
+    _make_tar_gz(source, files)
+
+    dest = tmp_path / "copy" / "archive.tar.gz"
+    unpack = tmp_path / "unpacked"
+    data_utils.download_file(
+        str(source), str(dest), unpack=True, dest_unpack=str(unpack)
+    )
+    _check_extracted(unpack, files)
+    assert not (unpack / "archive.tar").exists()
+
+
+def test_get_all_files_exclude_and(tmp_path):
+    from speechbrain.utils.data_utils import get_all_files
+
+    (tmp_path / "sub").mkdir()
+    excluded = [f"{i}_foo_bar.txt" for i in range(5)] + ["sub/b_bar_foo.txt"]
+    kept = [f"{i}_foo.txt" for i in range(10)] + [f"{i}.txt" for i in range(10)]
+    kept += ["sub/c_bar.txt", "sub/d.txt"]
+    for name in excluded + kept:
+        (tmp_path / name).touch()
+
+    # The patterns are matched against the full path, hence the underscores.
+    # Only the files matching all the patterns are excluded, whatever the
+    # order in which the directory entries are listed.
+    found = get_all_files(str(tmp_path), exclude_and=["_foo", "_bar"])
+    found = [pathlib.Path(f).relative_to(tmp_path).as_posix() for f in found]
+    assert sorted(found) == sorted(kept)
+
+    found = get_all_files(
+        str(tmp_path), match_or=["_foo"], exclude_and=["_foo", "_bar"]
+    )
+    found = [pathlib.Path(f).relative_to(tmp_path).as_posix() for f in found]
+    assert sorted(found) == sorted(f"{i}_foo.txt" for i in range(10))
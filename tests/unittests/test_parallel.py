@@ -46,3 +46,29 @@ def test_parallel_map():
 
     # trivial test for tqdm kwargs
     parallel_map(small_test_func, small_test_input, progress_bar_kwargs={})
+
+
+def test_get_process_count(monkeypatch):
+    from speechbrain.utils import parallel
+
+    # The CPU affinity takes precedence over the number of CPUs of the node
+    monkeypatch.setattr(
+        parallel.os,
+        "sched_getaffinity",
+        lambda pid: {0, 1, 2, 3},
+        raising=False,
+    )
+    monkeypatch.setattr(parallel.os, "cpu_count", lambda: 128)
+    assert parallel.available_cpu_count() == 4
+    assert parallel.get_process_count(2) == 8
+
+    # Falls back to a single process when the CPU count is unknown
+    monkeypatch.delattr(parallel.os, "sched_getaffinity")
+    monkeypatch.setattr(parallel.os, "cpu_count", lambda: None)
+    assert parallel.available_cpu_count() == 1
+    assert parallel.get_process_count(2) == 2
+
+    # ProcessPoolExecutor accepts at most 61 workers on Windows
+    monkeypatch.setattr(parallel.os, "cpu_count", lambda: 128)
+    monkeypatch.setattr(parallel.sys, "platform", "win32")
+    assert parallel.get_process_count(2) == 61